@@ -0,0 +1,134 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable
+
+
+class StarNeighboursCache:
+    """
+    In-memory cache for star neighbours results, keyed by `{user}/{repo}`.
+
+    Also keeps track of how often each repository is requested so that the most
+    popular entries can be refreshed in the background before they expire. The
+    request frequency decays exponentially, halving every
+    `popularity_half_life_seconds`, and both the cached results and the tracked
+    keys are bounded by `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        popularity_half_life_seconds: int = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_entries = max_entries
+        self._popularity_half_life_seconds = popularity_half_life_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        # Maps each key to its popularity score and when it was last requested.
+        self._popularity: dict[str, tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def _decayed_score(self, key: str, now: float) -> float:
+        score, last_requested_at = self._popularity[key]
+        elapsed = now - last_requested_at
+        return score * 0.5 ** (elapsed / self._popularity_half_life_seconds)
+
+    def record_request(self, key: str) -> None:
+        with self._lock:
+            now = self._clock()
+            score = self._decayed_score(key, now) if key in self._popularity else 0
+            self._popularity[key] = (score + 1, now)
+            if len(self._popularity) > self._max_entries:
+                least_popular_key = min(
+                    self._popularity, key=lambda k: self._decayed_score(k, now)
+                )
+                del self._popularity[least_popular_key]
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl_seconds)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, key: str) -> None:
+        """Drops both the cached result and the popularity of a key."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._popularity.pop(key, None)
+
+    def prune(self, max_idle_seconds: int) -> None:
+        """
+        Removes expired entries and stops tracking keys that have not been
+        requested within `max_idle_seconds`.
+
+        Args:
+            max_idle_seconds (int): How long a key is tracked after its last
+             request.
+        """
+        with self._lock:
+            now = self._clock()
+            for key in [k for k, (_, exp) in self._entries.items() if exp <= now]:
+                del self._entries[key]
+            for key in [
+                k
+                for k, (_, last_requested_at) in self._popularity.items()
+                if now - last_requested_at > max_idle_seconds
+            ]:
+                del self._popularity[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._popularity.clear()
+
+    def keys_due_for_refresh(
+        self, top_n: int, refresh_before_seconds: int, max_idle_seconds: int
+    ) -> list[str]:
+        """
+        Returns the most requested keys whose cached result is missing or will
+        expire within `refresh_before_seconds`, most popular first. Keys that
+        have not been requested within `max_idle_seconds` are left out.
+
+        Args:
+            top_n (int): The number of most requested keys to consider.
+            refresh_before_seconds (int): How long before expiry an entry is
+             considered due for refresh.
+            max_idle_seconds (int): How long a key is considered after its last
+             request.
+
+        Returns:
+            list[str]: The keys to refresh, ordered by popularity.
+        """
+        with self._lock:
+            now = self._clock()
+            recently_requested_keys = [
+                key
+                for key, (_, last_requested_at) in self._popularity.items()
+                if now - last_requested_at <= max_idle_seconds
+            ]
+            most_popular_keys = sorted(
+                recently_requested_keys,
+                key=lambda k: self._decayed_score(k, now),
+                reverse=True,
+            )[:top_n]
+            deadline = now + refresh_before_seconds
+            due_keys = []
+            for key in most_popular_keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[1] <= deadline:
+                    due_keys.append(key)
+            return due_keys
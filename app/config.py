@@ -10,6 +10,18 @@ class Settings(BaseSettings):
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 120
+    cache_ttl_seconds: int = 3600  # How long a star neighbours result is cached.
+    cache_max_entries: int = 1000  # The maximum number of repos cached and tracked.
+    popularity_half_life_seconds: int = 3600  # How fast request counts decay.
+    prewarm_enabled: bool = True  # Whether to run the background refresher.
+    prewarm_top_n: int = 10  # The number of most requested repos to keep warm.
+    prewarm_interval_seconds: int = 60  # How often the background refresher runs.
+    prewarm_max_refreshes_per_cycle: int = 2  # Refresh budget per run.
+    prewarm_refresh_before_seconds: int = 900  # Refresh entries this long before
+    # they expire. Should cover prewarm_interval_seconds plus
+    # prewarm_max_refreshes_per_cycle times the pipeline duration (a few minutes).
+    prewarm_min_rate_limit_remaining: int = 1000  # Skip refreshing when fewer
+    # GraphQL rate limit points than this are left.
 
 
 settings = Settings()
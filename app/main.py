@@ -1,24 +1,28 @@
+import asyncio
+import logging
+import threading
 from datetime import timedelta
 from functools import lru_cache
 from typing import Annotated, List
 
 from fastapi.security import OAuth2PasswordRequestForm
 from githubkit import GitHub
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import FastAPI, HTTPException, Request, status, Depends
 
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.gzip import GZipMiddleware
-from githubkit.exception import AuthCredentialError, GraphQLFailed
+from githubkit.exception import (
+    AuthCredentialError,
+    GitHubException,
+    GraphQLFailed,
+    PrimaryRateLimitExceeded,
+)
 
+from .cache import StarNeighboursCache
 from .config import Settings
 from .models import SessionDep, create_db_and_tables, User as UserModel
 from .schema import FastAPIException, ResponseItem, Token, User, UserCreate
-from .services import (
-    group_stargazer_ids_by_star_count,
-    starred_repos_by_batched_user_ids,
-    starred_repos_by_user_ids,
-    starred_repos_count_by_stargazers_of_repo,
-    transform_dict_to_list_of_dicts,
-)
+from .services import graphql_rate_limit_remaining, star_neighbours_of_repo
 from .utils import (
     authenticate_user,
     create_access_token,
@@ -26,14 +30,12 @@ from .utils import (
     get_password_hash,
 )
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
 
 
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
-
 
 @lru_cache
 def get_settings():
@@ -43,6 +45,109 @@ def get_settings():
 SettingsDep = Annotated[Settings, Depends(get_settings)]
 
 
+def get_star_neighbours_cache(request: Request) -> StarNeighboursCache:
+    return request.app.state.star_neighbours_cache
+
+
+StarNeighboursCacheDep = Annotated[
+    StarNeighboursCache, Depends(get_star_neighbours_cache)
+]
+
+
+def refresh_popular_star_neighbours(
+    settings: Settings,
+    star_neighbours_cache: StarNeighboursCache,
+    stop: threading.Event,
+):
+    star_neighbours_cache.prune(max_idle_seconds=settings.cache_ttl_seconds)
+    due_keys = star_neighbours_cache.keys_due_for_refresh(
+        top_n=settings.prewarm_top_n,
+        refresh_before_seconds=settings.prewarm_refresh_before_seconds,
+        max_idle_seconds=settings.cache_ttl_seconds,
+    )
+    if not due_keys:
+        return
+    github = GitHub(settings.github_api_secret)
+    # The budget counts attempts, as failed refreshes spend API points too.
+    for key in due_keys[: settings.prewarm_max_refreshes_per_cycle]:
+        if stop.is_set():
+            return
+        if (
+            graphql_rate_limit_remaining(github)
+            < settings.prewarm_min_rate_limit_remaining
+        ):
+            return
+        user, repo = key.split("/", 1)
+        try:
+            star_neighbours = star_neighbours_of_repo(
+                github=github,
+                user=user,
+                repo=repo,
+                stargazers_per_page=settings.stargazers_per_page,
+                max_sublist_length=settings.max_sublist_length,
+                max_stars_per_stargazer=settings.max_stars_per_stargazer,
+            )
+        except PrimaryRateLimitExceeded:
+            logger.warning("Rate limited while refreshing star neighbours of %s", key)
+            return
+        except GraphQLFailed as e:
+            logger.exception("Failed to refresh star neighbours of %s", key)
+            error_types = {error.type for error in e.response.errors}
+            if "RATE_LIMITED" in error_types:
+                return
+            if "NOT_FOUND" in error_types:
+                star_neighbours_cache.forget(key)
+            continue
+        except GitHubException:
+            # Keep the existing entry so that it can serve until it expires.
+            logger.exception("Failed to refresh star neighbours of %s", key)
+            continue
+        star_neighbours_cache.set(key, star_neighbours, settings.cache_ttl_seconds)
+
+
+async def refresh_popular_star_neighbours_periodically(
+    settings: Settings,
+    star_neighbours_cache: StarNeighboursCache,
+    stop: threading.Event,
+):
+    # Waiting on the stop event rather than sleeping lets shutdown end the loop
+    # without cancelling it, so a refresh in progress is never abandoned.
+    while not await asyncio.to_thread(stop.wait, settings.prewarm_interval_seconds):
+        try:
+            await run_in_threadpool(
+                refresh_popular_star_neighbours, settings, star_neighbours_cache, stop
+            )
+        except Exception:
+            logger.exception("Failed to refresh popular star neighbours")
+
+
+@app.on_event("startup")
+async def on_startup():
+    create_db_and_tables()
+    settings = get_settings()
+    app.state.star_neighbours_cache = StarNeighboursCache(
+        max_entries=settings.cache_max_entries,
+        popularity_half_life_seconds=settings.popularity_half_life_seconds,
+    )
+    app.state.refresher_stop = threading.Event()
+    app.state.refresher_task = None
+    if settings.prewarm_enabled:
+        app.state.refresher_task = asyncio.create_task(
+            refresh_popular_star_neighbours_periodically(
+                settings, app.state.star_neighbours_cache, app.state.refresher_stop
+            )
+        )
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if app.state.refresher_task is None:
+        return
+    # The refresher stops between repos; wait for the one in progress to finish.
+    app.state.refresher_stop.set()
+    await app.state.refresher_task
+
+
 @app.get(
     "/repos/{user}/{repo}/starneighbours",
     response_model=List[ResponseItem],
@@ -69,33 +174,25 @@ def get_repo_star_neighbours(
     user: str,
     repo: str,
     settings: Annotated[Settings, Depends(get_settings)],
+    star_neighbours_cache: StarNeighboursCacheDep,
     _: Annotated[User, Depends(get_current_active_user)],
 ):
+    # GitHub owner and repository names are case-insensitive.
+    key = f"{user}/{repo}".lower()
+    star_neighbours = star_neighbours_cache.get(key)
+    if star_neighbours is not None:
+        star_neighbours_cache.record_request(key)
+        return star_neighbours
     try:
         github = GitHub(settings.github_api_secret)
-        all_stargazers = starred_repos_count_by_stargazers_of_repo(
+        star_neighbours = star_neighbours_of_repo(
             github=github,
             user=user,
             repo=repo,
             stargazers_per_page=settings.stargazers_per_page,
-        )
-        batched_stargazers_ids = group_stargazer_ids_by_star_count(
-            stargazers=all_stargazers.less_than_100_stars_stargazers,
             max_sublist_length=settings.max_sublist_length,
-        )
-        less_popular_stargazers = starred_repos_by_batched_user_ids(
-            github=github,
-            user_ids_list=batched_stargazers_ids,
-            ignore_repo=f"{user}/{repo}",
-        )
-        more_popular_stargazers = starred_repos_by_user_ids(
-            github=github,
-            users_list=all_stargazers.more_than_100_stars_stargazers,
-            ignore_repo=f"{user}/{repo}",
             max_stars_per_stargazer=settings.max_stars_per_stargazer,
         )
-        merged_stargazers = less_popular_stargazers | more_popular_stargazers
-        return transform_dict_to_list_of_dicts(merged_stargazers)
     except GraphQLFailed as e:
         for error in e.response.errors:
             if error.type == "NOT_FOUND":
@@ -105,6 +202,9 @@ def get_repo_star_neighbours(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except AuthCredentialError as e:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    star_neighbours_cache.set(key, star_neighbours, settings.cache_ttl_seconds)
+    star_neighbours_cache.record_request(key)
+    return star_neighbours
 
 
 @app.post("/token")
@@ -80,7 +80,8 @@ def starred_repos_by_batched_user_ids(
         github (GitHub): An instance of the GitHub client.
         user_ids_list (list[list[str]]): A list of lists, where each inner list
          contains user IDs.
-        ignore_repo (str): The repository to be excluded from the results.
+        ignore_repo (str): The repository to be excluded from the results,
+         compared case-insensitively.
 
     Returns:
         dict[str, list[str]]: A dictionary where the keys are user logins and the
@@ -111,7 +112,8 @@ def starred_repos_by_batched_user_ids(
             batched_user_ids[user["login"]] = [
                 f"{repo['owner']['login']}/{repo['name']}"
                 for repo in user["starredRepositories"]["nodes"]
-                if f"{repo['owner']['login']}/{repo['name']}" != ignore_repo
+                if f"{repo['owner']['login']}/{repo['name']}".lower()
+                != ignore_repo.lower()
             ]
     return batched_user_ids
 
@@ -131,7 +133,8 @@ def starred_repos_by_user_ids(
         github (GitHub): An instance of the GitHub client.
         users_list (List[StargazerWithStarredReposCount]): A list of users with
         their starred repositories count.
-        ignore_repo (str): The repository to be excluded from the results.
+        ignore_repo (str): The repository to be excluded from the results,
+         compared case-insensitively.
         max_stars_per_stargazer (int): The maximum number of stars per stargazer
          to fetch.
 
@@ -169,7 +172,8 @@ def starred_repos_by_user_ids(
                 [
                     f"{repo['owner']['login']}/{repo['name']}"
                     for repo in result["node"]["starredRepositories"]["nodes"]
-                    if f"{repo['owner']['login']}/{repo['name']}" != ignore_repo
+                    if f"{repo['owner']['login']}/{repo['name']}".lower()
+                    != ignore_repo.lower()
                 ]
             )
             user_stars += 100
@@ -245,3 +249,76 @@ def transform_dict_to_list_of_dicts(input_dict):
         for repo, stargazers in repo_dict.items()
     ]
     return result
+
+
+def star_neighbours_of_repo(
+    github: GitHub,
+    user: str,
+    repo: str,
+    stargazers_per_page: int,
+    max_sublist_length: int,
+    max_stars_per_stargazer: int,
+) -> list[dict]:
+    """
+    Runs the whole star neighbours pipeline for a repository: fetches its
+    stargazers, then the repositories they have starred, and groups the result
+    by repository.
+
+    Args:
+        github (GitHub): An instance of the GitHub client.
+        user (str): The owner of the repository.
+        repo (str): The name of the repository.
+        stargazers_per_page (int): The number of stargazers to fetch per page.
+        max_sublist_length (int): The maximum number of elements in each sublist.
+        max_stars_per_stargazer (int): The maximum number of stars per stargazer
+         to fetch.
+
+    Returns:
+        list: A list of dictionaries, each containing a 'repo' key with the
+        repository name and a 'stargazers' key with a list of stargazers who
+        starred the repository.
+    """
+    all_stargazers = starred_repos_count_by_stargazers_of_repo(
+        github=github,
+        user=user,
+        repo=repo,
+        stargazers_per_page=stargazers_per_page,
+    )
+    batched_stargazers_ids = group_stargazer_ids_by_star_count(
+        stargazers=all_stargazers.less_than_100_stars_stargazers,
+        max_sublist_length=max_sublist_length,
+    )
+    less_popular_stargazers = starred_repos_by_batched_user_ids(
+        github=github,
+        user_ids_list=batched_stargazers_ids,
+        ignore_repo=f"{user}/{repo}",
+    )
+    more_popular_stargazers = starred_repos_by_user_ids(
+        github=github,
+        users_list=all_stargazers.more_than_100_stars_stargazers,
+        ignore_repo=f"{user}/{repo}",
+        max_stars_per_stargazer=max_stars_per_stargazer,
+    )
+    merged_stargazers = less_popular_stargazers | more_popular_stargazers
+    return transform_dict_to_list_of_dicts(merged_stargazers)
+
+
+def graphql_rate_limit_remaining(github: GitHub) -> int:
+    """
+    Fetches the number of GraphQL rate limit points left for the current token.
+
+    Args:
+        github (GitHub): An instance of the GitHub client.
+
+    Returns:
+        int: The number of remaining rate limit points.
+    """
+    query = """
+    query RateLimit {
+      rateLimit {
+        remaining
+      }
+    }
+    """
+    result = github.graphql(query)
+    return result["rateLimit"]["remaining"]
@@ -1,9 +1,18 @@
 from fastapi.testclient import TestClient
 
+from .cache import StarNeighboursCache
 from .config import Settings
-from .main import app, get_settings
+from .main import (
+    app,
+    get_settings,
+    get_star_neighbours_cache,
+    refresh_popular_star_neighbours,
+)
+from .schema import User
+from .utils import get_current_active_user
 
 import json
+import threading
 from pathlib import Path
 from typing import Any, Type, TypeVar, Union
 
@@ -11,6 +20,7 @@ import httpx
 import pytest
 
 from githubkit import GitHub
+from githubkit.exception import RequestTimeout
 from githubkit.utils import UNSET
 from githubkit.response import Response
 from githubkit.typing import URLTypes, UnsetType
@@ -19,10 +29,22 @@ client = TestClient(app)
 
 
 def get_settings_override():
-    return Settings(github_api_secret="very_secret_very_secure", secret_key="test")
+    return Settings(
+        github_api_secret="very_secret_very_secure",
+        secret_key="test",
+        prewarm_enabled=False,
+    )
+
+
+def get_current_active_user_override():
+    return User(username="test")
 
 
 app.dependency_overrides[get_settings] = get_settings_override
+app.dependency_overrides[get_current_active_user] = get_current_active_user_override
+
+star_neighbours_cache = StarNeighboursCache()
+app.dependency_overrides[get_star_neighbours_cache] = lambda: star_neighbours_cache
 
 STARRED_REPO_COUNT_BY_USERS = json.loads(
     Path("../fake_response_data/starred_repo_count_by_users.json").read_text()
@@ -34,9 +56,38 @@ STARRED_REPO_BY_USER_ID = json.loads(
     Path("../fake_response_data/starred_repos_by_user_id.json").read_text()
 )
 
+RATE_LIMIT = {"data": {"rateLimit": {"remaining": 5000}}}
+REPOSITORY_NOT_FOUND = {
+    "data": {"repository": None},
+    "errors": [
+        {
+            "type": "NOT_FOUND",
+            "path": ["repository"],
+            "message": "Could not resolve to a Repository.",
+        }
+    ],
+}
+
+REPOSITORY_RATE_LIMITED = {
+    "data": {"repository": None},
+    "errors": [
+        {
+            "type": "RATE_LIMITED",
+            "message": "API rate limit exceeded.",
+        }
+    ],
+}
+
 T = TypeVar("T")
 
 
+@pytest.fixture(autouse=True)
+def clear_star_neighbours_cache():
+    star_neighbours_cache.clear()
+    yield
+    star_neighbours_cache.clear()
+
+
 def mock_request(
     g: GitHub,
     method: str,
@@ -46,7 +97,28 @@ def mock_request(
     **kwargs: Any,
 ) -> Response[Any]:
     if method == "POST" and url == "/graphql":
-        if "StarredRepoCountByUsers" in kwargs["json"]["query"]:
+        if "RateLimit" in kwargs["json"]["query"]:
+            return Response[T](
+                httpx.Response(status_code=200, json=RATE_LIMIT),
+                Any if response_model is UNSET else response_model,
+            )
+        elif "StarredRepoCountByUsers" in kwargs["json"]["query"]:
+            if kwargs["json"]["variables"]["repo"] == "deleted":
+                return Response[T](
+                    httpx.Response(status_code=200, json=REPOSITORY_NOT_FOUND),
+                    Any if response_model is UNSET else response_model,
+                )
+            if kwargs["json"]["variables"]["repo"] == "rate-limited":
+                return Response[T](
+                    httpx.Response(
+                        status_code=200,
+                        json=REPOSITORY_RATE_LIMITED,
+                        request=httpx.Request("POST", url),
+                    ),
+                    Any if response_model is UNSET else response_model,
+                )
+            if kwargs["json"]["variables"]["repo"] == "unavailable":
+                raise RequestTimeout(httpx.TimeoutException("Timed out"))
             return Response[T](
                 httpx.Response(status_code=200, json=STARRED_REPO_COUNT_BY_USERS),
                 Any if response_model is UNSET else response_model,
@@ -79,3 +151,172 @@ def test_read_main():
             {"repo": "kubernetes/kubernetes", "stargazers": ["another"]},
             {"repo": "microsoft/vscode", "stargazers": ["another"]},
         ]
+
+
+def test_star_neighbours_cache_keys_due_for_refresh():
+    now = 0.0
+    cache = StarNeighboursCache(clock=lambda: now)
+    for _ in range(3):
+        cache.record_request("octocat/Hello-World")
+    cache.record_request("octocat/Spoon-Knife")
+    cache.record_request("octocat/linguist")
+    cache.set("octocat/Hello-World", [], ttl_seconds=100)
+    cache.set("octocat/Spoon-Knife", [], ttl_seconds=1000)
+
+    assert (
+        cache.keys_due_for_refresh(
+            top_n=2, refresh_before_seconds=60, max_idle_seconds=3600
+        )
+        == []
+    )
+
+    now = 50.0
+    assert cache.get("octocat/Hello-World") == []
+    assert cache.keys_due_for_refresh(
+        top_n=2, refresh_before_seconds=60, max_idle_seconds=3600
+    ) == ["octocat/Hello-World"]
+
+    now = 100.0
+    assert cache.get("octocat/Hello-World") is None
+    assert cache.keys_due_for_refresh(
+        top_n=3, refresh_before_seconds=60, max_idle_seconds=3600
+    ) == ["octocat/Hello-World", "octocat/linguist"]
+
+    now = 10000.0
+    cache.record_request("octocat/linguist")
+    assert cache.keys_due_for_refresh(
+        top_n=3, refresh_before_seconds=60, max_idle_seconds=3600
+    ) == ["octocat/linguist"]
+
+
+def test_star_neighbours_cache_is_bounded():
+    now = 0.0
+    cache = StarNeighboursCache(
+        max_entries=2, popularity_half_life_seconds=60, clock=lambda: now
+    )
+    for _ in range(3):
+        cache.record_request("octocat/Hello-World")
+    now = 600.0
+    cache.record_request("octocat/Spoon-Knife")
+    cache.record_request("octocat/linguist")
+    cache.set("octocat/Hello-World", [], ttl_seconds=1000)
+    cache.set("octocat/Spoon-Knife", [], ttl_seconds=1000)
+    cache.set("octocat/linguist", [], ttl_seconds=1000)
+
+    assert cache.get("octocat/Hello-World") is None
+    assert cache.keys_due_for_refresh(
+        top_n=3, refresh_before_seconds=2000, max_idle_seconds=3600
+    ) == ["octocat/Spoon-Knife", "octocat/linguist"]
+
+
+def recording_mock_request(queries: list[str]):
+    def _mock_request(g: GitHub, method: str, url: URLTypes, **kwargs: Any):
+        if method == "POST" and url == "/graphql":
+            queries.append(kwargs["json"]["query"])
+        return mock_request(g, method, url, **kwargs)
+
+    return _mock_request
+
+
+def test_read_main_is_cached():
+    queries = []
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(GitHub, "request", recording_mock_request(queries))
+
+        first_response = client.get("/repos/octocat/Hello-World/starneighbours")
+        queries_after_first_response = len(queries)
+        second_response = client.get("/repos/Octocat/hello-world/starneighbours")
+
+        assert first_response.status_code == 200
+        assert queries_after_first_response > 0
+        assert second_response.status_code == 200
+        assert second_response.json() == first_response.json()
+        assert len(queries) == queries_after_first_response
+
+
+def test_refresh_popular_star_neighbours_honours_budget():
+    settings = get_settings_override()
+    settings.prewarm_max_refreshes_per_cycle = 2
+    for _ in range(3):
+        star_neighbours_cache.record_request("octocat/deleted")
+    for _ in range(2):
+        star_neighbours_cache.record_request("octocat/hello-world")
+    star_neighbours_cache.record_request("octocat/spoon-knife")
+    queries = []
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(GitHub, "request", recording_mock_request(queries))
+
+        refresh_popular_star_neighbours(
+            settings, star_neighbours_cache, threading.Event()
+        )
+
+    assert star_neighbours_cache.get("octocat/hello-world") is not None
+    assert star_neighbours_cache.get("octocat/spoon-knife") is None
+    assert sum("StarredRepoCountByUsers" in query for query in queries) == 2
+
+
+def test_refresh_popular_star_neighbours_stops_on_low_rate_limit():
+    settings = get_settings_override()
+    settings.prewarm_min_rate_limit_remaining = 10000
+    star_neighbours_cache.record_request("octocat/hello-world")
+    queries = []
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(GitHub, "request", recording_mock_request(queries))
+
+        refresh_popular_star_neighbours(
+            settings, star_neighbours_cache, threading.Event()
+        )
+
+    assert star_neighbours_cache.get("octocat/hello-world") is None
+    assert all("RateLimit" in query for query in queries)
+
+
+def test_refresh_popular_star_neighbours_stops_when_rate_limited():
+    settings = get_settings_override()
+    for _ in range(2):
+        star_neighbours_cache.record_request("octocat/rate-limited")
+    star_neighbours_cache.record_request("octocat/hello-world")
+    star_neighbours_cache.set("octocat/rate-limited", [], ttl_seconds=60)
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(GitHub, "request", mock_request)
+
+        refresh_popular_star_neighbours(
+            settings, star_neighbours_cache, threading.Event()
+        )
+
+    assert star_neighbours_cache.get("octocat/rate-limited") == []
+    assert star_neighbours_cache.get("octocat/hello-world") is None
+
+
+def test_refresh_popular_star_neighbours_stops_when_asked():
+    settings = get_settings_override()
+    star_neighbours_cache.record_request("octocat/hello-world")
+    stop = threading.Event()
+    stop.set()
+
+    refresh_popular_star_neighbours(settings, star_neighbours_cache, stop)
+
+    assert star_neighbours_cache.get("octocat/hello-world") is None
+
+
+def test_refresh_popular_star_neighbours_continues_after_failure():
+    settings = get_settings_override()
+    settings.prewarm_max_refreshes_per_cycle = 3
+    for _ in range(3):
+        star_neighbours_cache.record_request("octocat/deleted")
+    for _ in range(2):
+        star_neighbours_cache.record_request("octocat/unavailable")
+    star_neighbours_cache.record_request("octocat/hello-world")
+    star_neighbours_cache.set("octocat/unavailable", [], ttl_seconds=60)
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(GitHub, "request", mock_request)
+
+        refresh_popular_star_neighbours(
+            settings, star_neighbours_cache, threading.Event()
+        )
+
+    assert star_neighbours_cache.get("octocat/hello-world") is not None
+    assert star_neighbours_cache.get("octocat/unavailable") == []
+    assert star_neighbours_cache.keys_due_for_refresh(
+        top_n=10, refresh_before_seconds=300, max_idle_seconds=3600
+    ) == ["octocat/unavailable"]